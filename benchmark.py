@@ -0,0 +1,283 @@
+"""
+Benchmark harness for the site_data app.
+
+Loads reproducible synthetic datasets into a scratch database and drives the main routes
+through the Flask test client, reporting latency percentiles, SQL statements per request
+and peak Python memory as JSON, so runs before and after a change can be compared. It
+also measures cold start: fresh processes importing the app, running create_app() and
+serving their first requests, against an empty database and against the loaded one.
+
+    python benchmark.py --rows 10000 --rows 100000 --output before.json
+    python benchmark.py --rows 10000 --rows 100000 --output after.json --compare before.json
+
+The database's site_data table is REPLACED. By default a temporary SQLite file is used;
+pass --database-url only for a throwaway PostgreSQL database.
+"""
+import os
+import sys
+import json
+import time
+import random
+import platform
+import tempfile
+import itertools
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+import click
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Runs in a fresh interpreter; prints the phase timings as JSON
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app as site_app
+imported = time.perf_counter()
+site_app.create_app()
+created = time.perf_counter()
+client = site_app.app.test_client()
+client.get('/').get_data()
+first_get = time.perf_counter()
+client.post('/', data={'view_mode': 'rows'}).get_data()
+first_post = time.perf_counter()
+client.post('/', data={'view_mode': 'rows'}).get_data()
+second_post = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_get_ms': (first_get - created) * 1000,
+    'first_post_ms': (first_post - first_get) * 1000,
+    'second_post_ms': (second_post - first_post) * 1000,
+}))
+"""
+
+
+def measure_startup(database_url, runs):
+    """Median phase timings of `runs` fresh processes starting against `database_url`."""
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, DATABASE_URL=database_url)
+        )
+        sample = json.loads(completed.stdout.strip().splitlines()[-1])
+        sample['process_ms'] = (time.perf_counter() - started) * 1000
+        samples.append(sample)
+    return {key: round(percentile([sample[key] for sample in samples], 0.5), 3) for key in samples[0]}
+
+
+def build_scenarios(site_app, client, rng):
+    """Returns (name, iterations factor, request function) for every benchmarked request."""
+    with site_app.app.app_context():
+        combination, other = rng.sample(site_app.facet_cache.combinations(), 2)
+        row_ids = [row_id for (row_id,) in site_app.db.session.query(site_app.SiteData.id)
+                   .order_by(site_app.func.random()).limit(1000)]
+
+    def filter_form(dims, view_mode='rows'):
+        form = {f'{dim}_filter': value for dim, value in zip(site_app.FILTER_DIMENSIONS, combination) if dim in dims}
+        form['view_mode'] = view_mode
+        return form
+
+    scenarios = [('index GET', 1, lambda: client.get('/'))]
+    # Every combination of the four filters, as the results table and as the totals view
+    for size in range(len(site_app.FILTER_DIMENSIONS) + 1):
+        for dims in itertools.combinations(site_app.FILTER_DIMENSIONS, size):
+            label = '+'.join(dims) or 'all'
+            for view_mode in ('rows', 'totals'):
+                form = filter_form(dims, view_mode)
+                scenarios.append((f'index POST {view_mode} {label}', 1, lambda form=form: client.post('/', data=form)))
+
+    first_page = client.get('/api/sites', query_string={'page_size': 50}).get_json()
+    region_etag = client.get('/api/sites', query_string={'region': combination[0]}).headers['ETag']
+    hubs = sorted({combination[1], other[1]})
+    scenarios += [
+        ('index POST next page', 1, lambda: client.post(
+            '/', data=dict(filter_form(()), cursor=first_page['next_cursor'], direction='next'))),
+        ('index POST rows hub IN', 1, lambda: client.post('/', data={'hub_filter': hubs, 'view_mode': 'rows'})),
+        ('index POST drilldown region', 1, lambda: client.post('/', data=filter_form(('region',), 'drilldown'))),
+        ('api drilldown countries', 1, lambda: client.get(
+            '/api/drilldown', query_string={'region': combination[0], 'by': 'country'})),
+        ('api sites region', 1, lambda: client.get('/api/sites', query_string={'region': combination[0]})),
+        # Runs before 'edit', so the tag is still current
+        ('api sites 304', 1, lambda: client.get(
+            '/api/sites', query_string={'region': combination[0]}, headers={'If-None-Match': region_etag})),
+        ('edit', 1, lambda: client.post(
+            f'/edit_data/{rng.choice(row_ids)}',
+            data={'rse_count': rng.randint(0, 500), 'dse_count': rng.randint(0, 500), 'itc_count': rng.randint(0, 500)},
+            headers={'Accept': 'application/json'}
+        )),
+        # Exports read far more rows, so they run fewer times
+        ('download region', 0.25, lambda: client.post(
+            '/download_data', data=filter_form(('region',)), headers={'Accept-Encoding': 'identity'})),
+        ('download all', 0.25, lambda: client.post(
+            '/download_data', data=filter_form(()), headers={'Accept-Encoding': 'identity'})),
+    ]
+    if 'parquet' in site_app.available_export_formats():
+        scenarios.append(('download all parquet', 0.25, lambda: client.post(
+            '/download_data', data=dict(filter_form(()), format='parquet'))))
+    return scenarios
+
+
+def run_scenario(site_app, request, iterations, cold, query_counter):
+    """Times `iterations` requests, then repeats one under tracemalloc for the memory peak."""
+    latencies, queries = [], []
+    for _ in range(iterations):
+        if cold:
+            site_app.fragment_cache.clear()
+        before = query_counter[0]
+        started = time.perf_counter()
+        response = request()
+        response.get_data()  # Drains streamed bodies
+        latencies.append(time.perf_counter() - started)
+        queries.append(query_counter[0] - before)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+
+    if cold:
+        site_app.fragment_cache.clear()
+    tracemalloc.start()
+    request().get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'requests': iterations,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'queries_per_request': round(sum(queries) / len(queries), 2),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def print_comparison(results, baseline_path):
+    """Prints the p50 change of every scenario that is also in the baseline file."""
+    with open(baseline_path) as handle:
+        baseline = {(result['rows'], result['scenario']): result for result in json.load(handle)['results']}
+    for result in results:
+        before = baseline.get((result['rows'], result['scenario']))
+        if before is None:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        print(f"{result['rows']:>9} {result['scenario']:<40} p50 {before['p50_ms']:>9.2f} -> {result['p50_ms']:>9.2f} ms "
+              f"({change:+.1f}%), queries {before['queries_per_request']} -> {result['queries_per_request']}",
+              file=sys.stderr)
+
+
+@click.command()
+@click.option('--rows', 'sizes', type=int, multiple=True, default=(10000, 100000), show_default=True,
+              help='Dataset size; repeat for several (e.g. --rows 10000 --rows 1000000).')
+@click.option('--database-url', default=None, help='Throwaway database to use. Its site_data is replaced!')
+@click.option('--iterations', default=30, show_default=True, help='Timed requests per scenario.')
+@click.option('--seed', default=0, show_default=True, help='Seed for the data and the request mix.')
+@click.option('--cold', is_flag=True, help='Clear the rendered-fragment cache before every request.')
+@click.option('--output', default='-', show_default=True, help='JSON results file ("-" for stdout).')
+@click.option('--startup-runs', default=3, show_default=True, help='Fresh processes timed per startup measurement (0 = skip).')
+@click.option('--compare', 'baseline', type=click.Path(exists=True, dir_okay=False),
+              help='Earlier --output file to print p50 changes against.')
+def main(sizes, database_url, iterations, seed, cold, startup_runs, output, baseline):
+    """Benchmarks index, edit and download against synthetic datasets."""
+    scratch = None
+    if database_url is None:
+        scratch = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+        scratch.close()
+        database_url = f'sqlite:///{scratch.name}'
+    os.environ['DATABASE_URL'] = database_url
+
+    results = []
+    if startup_runs and scratch is not None:
+        # Every run after the first finds the schema already in place, so time each against its own file
+        empty_runs = []
+        for _ in range(startup_runs):
+            empty = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+            empty.close()
+            os.unlink(empty.name)
+            try:
+                empty_runs.append(measure_startup(f'sqlite:///{empty.name}', 1))
+            finally:
+                if os.path.exists(empty.name):
+                    os.unlink(empty.name)
+        result = {key: round(percentile([run[key] for run in empty_runs], 0.5), 3) for key in empty_runs[0]}
+        results.append(dict(rows=0, scenario='startup empty database', **result))
+        print(f"INFO: Startup on an empty database: {result}", file=sys.stderr)
+
+    import app as site_app  # Reads DATABASE_URL at import time
+
+    site_app.create_app()
+    client = site_app.app.test_client()
+    query_counter = [0]
+    with site_app.app.app_context():
+        engine = site_app.db.engine
+        site_app.event.listen(engine, 'after_cursor_execute',
+                              lambda *args: query_counter.__setitem__(0, query_counter[0] + 1))
+        dialect = engine.dialect.name
+
+    try:
+        for size in sizes:
+            started = time.perf_counter()
+            success, message = site_app.load_synthetic_site_data(size, seed, mode='replace')
+            if not success:
+                raise click.ClickException(message)
+            load_seconds = time.perf_counter() - started
+            print(f"INFO: Loaded {size} rows in {load_seconds:.1f}s.", file=sys.stderr)
+
+            rng = random.Random(seed)
+            for name, factor, request in build_scenarios(site_app, client, rng):
+                result = run_scenario(site_app, request, max(1, int(iterations * factor)), cold, query_counter)
+                results.append(dict(rows=size, scenario=name, **result))
+                print(f"INFO: {size:>9} {name:<40} p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+                      f"{result['queries_per_request']:>6} queries", file=sys.stderr)
+            results.append({'rows': size, 'scenario': 'load', 'load_seconds': round(load_seconds, 3)})
+            if startup_runs:
+                result = measure_startup(database_url, startup_runs)
+                results.append(dict(rows=size, scenario='startup', **result))
+                print(f"INFO: {size:>9} startup {result}", file=sys.stderr)
+    finally:
+        if scratch is not None:
+            os.unlink(scratch.name)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'dialect': dialect,
+            'snapshot_engine': bool(site_app.snapshot_engine()),
+            'iterations': iterations,
+            'seed': seed,
+            'cold': cold,
+        },
+        'results': results,
+    }
+    if output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+    if baseline:
+        print_comparison([result for result in results if 'p50_ms' in result], baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+"""
+Gunicorn settings (gunicorn loads ./gunicorn.conf.py automatically).
+
+The app is imported once in the master (preload_app), which also runs the one-time
+database initialisation, and the workers are forked from it. Each worker then gets its own
+connection pool, sized by DB_POOL_SIZE (default: GUNICORN_THREADS + EXPORT_WORKERS).
+"""
+import os
+import glob
+
+wsgi_app = 'wsgi:application'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    # Worker metric files left by a previous run would otherwise be added to this run's totals
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, 'metrics-*.json')):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # Never share a pooled connection opened in the master with a worker
+    from app import dispose_engines
+    dispose_engines(close=False)
@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers:
+
+    gunicorn -c gunicorn.conf.py
+
+gunicorn.conf.py points gunicorn here. create_app() creates and migrates the schema (once,
+under a lock) before the first request is served.
+"""
+from app import create_app
+
+application = app = create_app()